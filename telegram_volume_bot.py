@@ -19,11 +19,16 @@ Priority rules:
 """
 
 import asyncio, logging, os, time, io, traceback, re
-from dataclasses import dataclass
+from dataclasses import dataclass, field
 from typing import Dict, List, Tuple, Optional
 
-import ccxt  # type: ignore
-from tabulate import tabulate  # type: ignore
+import ccxt.async_support as ccxt  # type: ignore
+import numpy as np
+
+try:
+    import orjson  # type: ignore
+except ImportError:
+    orjson = None  # stdlib json via ccxt's default parse_json
 from openpyxl import Workbook  # type: ignore
 from telegram import Update, InputFile
 from telegram.constants import ParseMode
@@ -41,16 +46,33 @@ TOP_N_P3 = 10
 
 EXCHANGE_ID = "coinex"
 TOKEN = os.environ.get("TELEGRAM_TOKEN")
-STABLES = {"USD","USDT","USDC","TUSD","FDUSD","USDD","USDE","DAI","PYUSD"}
+STABLES = frozenset({"USD","USDT","USDC","TUSD","FDUSD","USDD","USDE","DAI","PYUSD"})
+STABLES_ARR = np.array(sorted(STABLES))
 
 # Pinned coins: must appear only in P3 (never in P1/P2)
 PINNED_P3 = ["BTC","ETH","XRP","SOL","DOGE","ADA","PEPE","LINK"]
-PINNED_SET = set(PINNED_P3)
+PINNED_SET = frozenset(PINNED_P3)
 
-LAST_ERROR: Optional[str] = None
-PCT4H_CACHE: Dict[Tuple[str,str], float] = {}
+PCT4H_TTL = 300.0  # seconds; well under the 1h candle granularity
+SCREEN_CACHE_TTL = 30.0  # seconds
 
 @dataclass
+class BotState:
+    """All mutable runtime state shared by the handlers, in one place instead of loose globals."""
+    last_error: Optional[str] = None
+    # (market_type, symbol) -> (pct4h, monotonic ts); entries expire after PCT4H_TTL
+    # instead of being wiped per command, so repeat calls skip the OHLCV round trips.
+    pct4h_cache: Dict[Tuple[str,str], Tuple[float, float]] = field(default_factory=dict)
+    # Last /screen rendering as (monotonic ts, text); see render_screen.
+    screen_cache: Optional[Tuple[float, str]] = None
+    screen_lock: asyncio.Lock = field(default_factory=asyncio.Lock)
+
+STATE = BotState()
+
+# Precompiled once at import; skips re's cache lookup on every free-text message.
+SYM_RE = re.compile(r"[A-Za-z$]{2,10}")
+
+@dataclass(slots=True)
 class MarketVol:
     symbol: str
     base: str
@@ -68,19 +90,6 @@ def safe_split_symbol(sym: Optional[str]):
     if "/" not in pair: return None
     return tuple(pair.split("/", 1))
 
-def to_mv(t: dict) -> Optional[MarketVol]:
-    sym = t.get("symbol")
-    split = safe_split_symbol(sym)
-    if not split: return None
-    base, quote = split
-    last = float(t.get("last") or t.get("close") or 0.0)
-    open_ = float(t.get("open") or 0.0)
-    percentage = float(t.get("percentage") or 0.0)
-    base_vol = float(t.get("baseVolume") or 0.0)
-    quote_vol = float(t.get("quoteVolume") or 0.0)
-    vwap = float(t.get("vwap") or 0.0)
-    return MarketVol(sym, base, quote, last, open_, percentage, base_vol, quote_vol, vwap)
-
 def usd_notional(mv: Optional[MarketVol]) -> float:
     """24h notional in USD terms. Prefer quoteVolume if USD-quoted; else baseVolume * (vwap or last)."""
     if not mv: return 0.0
@@ -110,88 +119,186 @@ def m_dollars_int(x: float) -> str:
     """Return millions as an integer (rounded)."""
     return str(round(x / 1_000_000.0))
 
+def orjson_parse(s) -> Optional[dict]:
+    """Drop-in for ccxt's parse_json: orjson decode, None on garbage (matching ccxt's behavior)."""
+    try:
+        return orjson.loads(s if isinstance(s, (bytes, bytearray)) else s.encode())
+    except orjson.JSONDecodeError:
+        return None
+
 def build_exchange(default_type: str):
     klass = ccxt.__dict__[EXCHANGE_ID]
-    return klass({
+    ex = klass({
         "enableRateLimit": True,
         "timeout": 20000,
         "options": {"defaultType": default_type},
     })
-
-def safe_fetch_tickers(ex: ccxt.Exchange) -> Dict[str, dict]:
+    if orjson is not None:
+        # The spot+swap ticker blobs are ~1-2 MB of JSON; orjson decodes them several times
+        # faster than the stdlib json that ccxt routes through parse_json by default.
+        ex.parse_json = orjson_parse
+    return ex
+
+# Shared exchange singletons: constructed once, markets loaded once, reused by every command.
+_SPOT_EX: Optional[ccxt.Exchange] = None
+_SWAP_EX: Optional[ccxt.Exchange] = None
+_EX_LOCK = asyncio.Lock()
+
+async def get_exchanges() -> Tuple[ccxt.Exchange, ccxt.Exchange]:
+    """Return the shared (spot, swap) exchanges, creating them and loading markets on first use."""
+    global _SPOT_EX, _SWAP_EX
+    async with _EX_LOCK:
+        if _SPOT_EX is None:
+            _SPOT_EX = build_exchange("spot")
+        if _SWAP_EX is None:
+            _SWAP_EX = build_exchange("swap")
+        if not _SPOT_EX.markets or not _SWAP_EX.markets:
+            await asyncio.gather(_SPOT_EX.load_markets(), _SWAP_EX.load_markets())
+    return _SPOT_EX, _SWAP_EX
+
+async def safe_fetch_tickers(ex: ccxt.Exchange) -> Dict[str, dict]:
     try:
-        ex.load_markets()
-        return ex.fetch_tickers()
+        return await ex.fetch_tickers()
     except Exception as e:
-        global LAST_ERROR
-        LAST_ERROR = f"{type(e).__name__}: {e}"
+        STATE.last_error = f"{type(e).__name__}: {e}"
         logging.exception("fetch_tickers failed")
         return {}
 
-def load_best() -> Tuple[Dict[str, MarketVol], Dict[str, MarketVol], int, int]:
-    """Return best spot/futures tickers per BASE (no exclusions)."""
-    # SPOT
-    ex_spot = build_exchange("spot")
-    spot_tickers = safe_fetch_tickers(ex_spot)
-    best_spot: Dict[str, MarketVol] = {}
-    for _, t in spot_tickers.items():
-        mv = to_mv(t)
-        if not mv: continue
-        if mv.quote not in STABLES: continue
-        prev = best_spot.get(mv.base)
-        if prev is None or usd_notional(mv) > usd_notional(prev):
-            best_spot[mv.base] = mv
-
-    # FUTURES (swap)
-    ex_fut = build_exchange("swap")
-    fut_tickers = safe_fetch_tickers(ex_fut)
-    best_fut: Dict[str, MarketVol] = {}
-    for _, t in fut_tickers.items():
-        mv = to_mv(t)
-        if not mv: continue
-        prev = best_fut.get(mv.base)
-        if prev is None or usd_notional(mv) > usd_notional(prev):
-            best_fut[mv.base] = mv
+def best_per_base(ids: np.ndarray, usd: np.ndarray, n_groups: int) -> np.ndarray:
+    """Single-pass group-by-max: index of the highest-USD row for each base id (-1 if none)."""
+    out = np.full(n_groups, -1, np.int64)
+    best = np.full(n_groups, -np.inf)
+    for i in range(ids.size):
+        g = ids[i]
+        if usd[i] > best[g]:
+            best[g] = usd[i]
+            out[g] = i
+    return out
+
+try:
+    from numba import njit  # type: ignore
+    best_per_base = njit(cache=True)(best_per_base)  # cache=True avoids recompiling on restart
+except ImportError:
+    pass  # plain-Python loop is correct, just slower
+
+def best_by_base(tickers: Dict[str, dict], stable_quotes_only: bool) -> Dict[str, MarketVol]:
+    """
+    Pick the max-USD-notional market per BASE using struct-of-arrays NumPy columns
+    instead of per-ticker dict/float work in the interpreter.
+    """
+    symbols: List[str] = []
+    bases: List[str] = []; quotes: List[str] = []
+    last_l: List[float] = []; open_l: List[float] = []; pct_l: List[float] = []
+    bvol_l: List[float] = []; qvol_l: List[float] = []; vwap_l: List[float] = []
+    for t in tickers.values():
+        sym = t.get("symbol")
+        split = safe_split_symbol(sym)
+        if not split: continue
+        base, quote = split
+        symbols.append(sym); bases.append(base); quotes.append(quote)
+        last_l.append(float(t.get("last") or t.get("close") or 0.0))
+        open_l.append(float(t.get("open") or 0.0))
+        pct_l.append(float(t.get("percentage") or 0.0))
+        bvol_l.append(float(t.get("baseVolume") or 0.0))
+        qvol_l.append(float(t.get("quoteVolume") or 0.0))
+        vwap_l.append(float(t.get("vwap") or 0.0))
+    if not bases:
+        return {}
+
+    base_arr = np.array(bases); quote_arr = np.array(quotes)
+    last = np.array(last_l); vwap = np.array(vwap_l)
+    base_vol = np.array(bvol_l); quote_vol = np.array(qvol_l)
+
+    # Same rule as usd_notional, vectorized: quoteVolume when USD-quoted, else baseVolume * (vwap or last).
+    price = np.where(vwap > 0, vwap, last)
+    usd = np.where(np.isin(quote_arr, STABLES_ARR) & (quote_vol > 0), quote_vol, base_vol * price)
+
+    keep = np.isin(quote_arr, STABLES_ARR) if stable_quotes_only else np.ones(base_arr.size, dtype=bool)
+    kept = np.flatnonzero(keep)
+    if kept.size == 0:
+        return {}
+
+    # Group-by-base argmax: map bases to int ids, then one pass over the kept rows.
+    uniq, inv = np.unique(base_arr[kept], return_inverse=True)
+    win = kept[best_per_base(inv.astype(np.int64), usd[kept], uniq.size)]
+
+    best: Dict[str, MarketVol] = {}
+    for g, i in enumerate(win):
+        best[str(uniq[g])] = MarketVol(
+            symbols[i], bases[i], quotes[i], last_l[i], open_l[i],
+            pct_l[i], bvol_l[i], qvol_l[i], vwap_l[i],
+        )
+    return best
 
+async def load_best() -> Tuple[Dict[str, MarketVol], Dict[str, MarketVol], int, int]:
+    """Return best spot/futures tickers per BASE (no exclusions). Fetches spot+swap concurrently."""
+    ex_spot, ex_fut = await get_exchanges()
+    spot_tickers, fut_tickers = await asyncio.gather(
+        safe_fetch_tickers(ex_spot), safe_fetch_tickers(ex_fut)
+    )
+    best_spot = best_by_base(spot_tickers, stable_quotes_only=True)
+    best_fut = best_by_base(fut_tickers, stable_quotes_only=False)
     return best_spot, best_fut, len(spot_tickers), len(fut_tickers)
 
-# ---- 4H % from 1h OHLCV ----
-def compute_pct4h_for_symbol(market_symbol: str, prefer_swap: bool = True) -> float:
+# ---- 4H % from OHLCV ----
+async def compute_pct4h_for_symbol(market_symbol: str, prefer_swap: bool = True) -> float:
     """
-    Compute % change over the last 4 completed hours using 1h candles.
+    Compute % change over the last completed 4h candle (close vs the close
+    before it); falls back to the last 4 completed hours from 1h candles
+    where the market has no 4h timeframe.
     Prefer futures ('swap') series; fall back to spot if needed.
     """
-    cache_key = ("swap" if prefer_swap else "spot", market_symbol)
-    if cache_key in PCT4H_CACHE:
-        return PCT4H_CACHE[cache_key]
-
     try_order = ["swap", "spot"] if prefer_swap else ["spot", "swap"]
     for dtype in try_order:
         ck = (dtype, market_symbol)
-        if ck in PCT4H_CACHE:
-            return PCT4H_CACHE[ck]
+        cached = STATE.pct4h_cache.get(ck)
+        if cached and time.monotonic() - cached[1] < PCT4H_TTL:
+            return cached[0]
+        ex_spot, ex_fut = await get_exchanges()
+        ex = ex_fut if dtype == "swap" else ex_spot
         try:
-            ex = build_exchange(dtype)
-            ex.load_markets()
-            candles = ex.fetch_ohlcv(market_symbol, timeframe="1h", limit=5)
+            # Prefer native 4h candles: 3 rows instead of 5, so less payload to fetch and parse.
+            # The last row is the in-progress candle; diff the two completed ones so the
+            # %4H always covers a full 4-hour window.
+            if ex.has.get("fetchOHLCV") and ex.timeframes and "4h" in ex.timeframes:
+                candles = await ex.fetch_ohlcv(market_symbol, timeframe="4h", limit=3)
+                if candles and len(candles) >= 3 and candles[-3][4]:
+                    pct4h = (candles[-2][4] - candles[-3][4]) / candles[-3][4] * 100.0
+                    STATE.pct4h_cache[ck] = (pct4h, time.monotonic())
+                    return pct4h
+            # Fallback: derive 4h % from five 1h candles.
+            candles = await ex.fetch_ohlcv(market_symbol, timeframe="1h", limit=5)
             if not candles or len(candles) < 5:
-                PCT4H_CACHE[ck] = 0.0
+                STATE.pct4h_cache[ck] = (0.0, time.monotonic())
                 continue
             closes = [c[4] for c in candles]
             pct4h = ((closes[-1] - closes[0]) / closes[0] * 100.0) if closes[0] else 0.0
-            PCT4H_CACHE[ck] = pct4h
+            STATE.pct4h_cache[ck] = (pct4h, time.monotonic())
             return pct4h
         except Exception:
             logging.exception("compute_pct4h_for_symbol failed for %s (%s)", market_symbol, dtype)
-            PCT4H_CACHE[ck] = 0.0
+            STATE.pct4h_cache[ck] = (0.0, time.monotonic())
             continue
     return 0.0
 
+PCT4H_CONCURRENCY = 8  # max OHLCV fetches in flight (respects CoinEx rate limits)
+
+async def fetch_all_pct4h(requests: List[Tuple[str, bool]]) -> Dict[Tuple[str, bool], float]:
+    """Fetch 4H % for many (symbol, prefer_swap) pairs concurrently, capped by a semaphore."""
+    reqs = list(dict.fromkeys(requests))  # dedupe, keep order
+    sem = asyncio.Semaphore(PCT4H_CONCURRENCY)
+    async def one(sym: str, prefer_swap: bool) -> float:
+        async with sem:
+            return await compute_pct4h_for_symbol(sym, prefer_swap)
+    vals = await asyncio.gather(*(one(sym, prefer) for sym, prefer in reqs))
+    return dict(zip(reqs, vals))
+
 # ---- Priorities ----
-def build_priorities(best_spot: Dict[str,MarketVol], best_fut: Dict[str,MarketVol]):
+def select_priorities(best_spot: Dict[str,MarketVol], best_fut: Dict[str,MarketVol]):
     """
-    Returns:
-      p1, p2, p3  where each row = [base, fut_usd, spot_usd, pct_24h, pct_4h]
+    Pure selection pass (no I/O). Returns p1, p2, p3 where each row =
+    [base, fut_usd, spot_usd, pct_24h, (symbol, prefer_swap)] — the last slot
+    is the OHLCV request needed to fill in pct_4h later.
     Sorting:
       P1 & P2 by FUT USD desc (EXCLUDE pinned).
       P3 always includes pinned coins + others with SPOT ≥ $3M; pinned first; cap to 10.
@@ -199,15 +306,15 @@ def build_priorities(best_spot: Dict[str,MarketVol], best_fut: Dict[str,MarketVo
     p1_full, p2_full = [], []
     used = set()  # bases already placed in P1 or P2
 
+    # USD notionals are needed several times per base below; compute each once.
+    spot_usd = {base: usd_notional(mv) for base, mv in best_spot.items()}
+    fut_usd = {base: usd_notional(mv) for base, mv in best_fut.items()}
+
     # --- P1: Fut≥5M & Spot≥500k (EXCLUDING pinned) ---
-    for base in set(best_spot) & set(best_fut):
-        if base in PINNED_SET:
-            continue  # hard exclude pinned from P1
+    for base in (best_spot.keys() & best_fut.keys()) - PINNED_SET:
         s, f = best_spot[base], best_fut[base]
-        fut_usd, spot_usd = usd_notional(f), usd_notional(s)
-        if fut_usd >= P1_FUT_MIN and spot_usd >= P1_SPOT_MIN:
-            pct4h = compute_pct4h_for_symbol(f.symbol, True)
-            p1_full.append([base, fut_usd, spot_usd, pct_change(s, f), pct4h])
+        if fut_usd[base] >= P1_FUT_MIN and spot_usd[base] >= P1_SPOT_MIN:
+            p1_full.append([base, fut_usd[base], spot_usd[base], pct_change(s, f), (f.symbol, True)])
 
     # Sort and slice
     p1_full.sort(key=lambda r: r[1], reverse=True)
@@ -217,14 +324,11 @@ def build_priorities(best_spot: Dict[str,MarketVol], best_fut: Dict[str,MarketVo
     used.update({r[0] for r in p1})
 
     # --- P2: Fut≥2M (EXCLUDING pinned and already used) ---
-    for base, f in best_fut.items():
-        if base in used or base in PINNED_SET:
-            continue  # hard exclude pinned from P2
-        fut_usd = usd_notional(f)
-        if fut_usd >= P2_FUT_MIN:
+    for base in best_fut.keys() - used - PINNED_SET:
+        f = best_fut[base]
+        if fut_usd[base] >= P2_FUT_MIN:
             s = best_spot.get(base)
-            pct4h = compute_pct4h_for_symbol(f.symbol, True)
-            p2_full.append([base, fut_usd, usd_notional(s) if s else 0.0, pct_change(s, f), pct4h])
+            p2_full.append([base, fut_usd[base], spot_usd.get(base, 0.0), pct_change(s, f), (f.symbol, True)])
 
     p2_full.sort(key=lambda r: r[1], reverse=True)
     p2 = p2_full[:TOP_N_P2]
@@ -241,21 +345,17 @@ def build_priorities(best_spot: Dict[str,MarketVol], best_fut: Dict[str,MarketVo
         f = best_fut.get(base)
         if not s and not f:
             continue  # no data available
-        fut_usd = usd_notional(f) if f else 0.0
-        spot_usd = usd_notional(s) if s else 0.0
         pct = pct_change(s, f)
-        pct4h = compute_pct4h_for_symbol(f.symbol, True) if f else (compute_pct4h_for_symbol(s.symbol, False) if s else 0.0)
-        p3_dict[base] = [base, fut_usd, spot_usd, pct, pct4h]
+        req = (f.symbol, True) if f else (s.symbol, False)
+        p3_dict[base] = [base, fut_usd.get(base, 0.0), spot_usd.get(base, 0.0), pct, req]
 
     # Add non-pinned others meeting Spot≥3M (not already used)
-    for base, s in best_spot.items():
-        if base in used or base in PINNED_SET:
-            continue
-        spot_usd = usd_notional(s)
-        if spot_usd >= P3_SPOT_MIN:
+    for base in best_spot.keys() - used - PINNED_SET:
+        s = best_spot[base]
+        if spot_usd[base] >= P3_SPOT_MIN:
             f = best_fut.get(base)
-            pct4h = compute_pct4h_for_symbol(f.symbol, True) if f else compute_pct4h_for_symbol(s.symbol, False)
-            p3_dict[base] = [base, usd_notional(f) if f else 0.0, spot_usd, pct_change(s, f), pct4h]
+            req = (f.symbol, True) if f else (s.symbol, False)
+            p3_dict[base] = [base, fut_usd.get(base, 0.0), spot_usd[base], pct_change(s, f), req]
 
     # Sort: pinned first by spot desc, then others by spot desc; cap to TOP_N_P3
     all_rows = list(p3_dict.values())
@@ -267,15 +367,39 @@ def build_priorities(best_spot: Dict[str,MarketVol], best_fut: Dict[str,MarketVo
 
     return p1, p2, p3
 
+async def build_priorities(best_spot: Dict[str,MarketVol], best_fut: Dict[str,MarketVol]):
+    """
+    Returns:
+      p1, p2, p3  where each row = [base, fut_usd, spot_usd, pct_24h, pct_4h]
+    Selection is pure Python; the 4H % OHLCV fetches for the final rows are
+    batched concurrently instead of one serial round trip per base.
+    """
+    p1, p2, p3 = select_priorities(best_spot, best_fut)
+    pct4h_reqs = [row[4] for row in p1 + p2 + p3]
+    pct4h_map = await fetch_all_pct4h(pct4h_reqs)
+    for row in p1 + p2 + p3:
+        row[4] = pct4h_map.get(row[4], 0.0)
+    return p1, p2, p3
+
 # ---- Formatting ----
+TABLE_HEADERS = ["SYM","F","S","%","%4H"]
+
+def render_github_table(rows: List[List[str]], headers: List[str]) -> str:
+    """Render a github-style pipe table. Hand-rolled for the fixed 5-column layout — much cheaper than tabulate."""
+    widths = [max(len(h), *(len(r[i]) for r in rows)) for i, h in enumerate(headers)]
+    def line(cells: List[str]) -> str:
+        return "| " + " | ".join(c.ljust(w) for c, w in zip(cells, widths)) + " |"
+    sep = "|" + "|".join("-" * (w + 2) for w in widths) + "|"
+    return "\n".join([line(headers), sep] + [line(r) for r in rows])
+
 def fmt_table(rows: List[List], title: str) -> str:
     if not rows: return f"*{title}*: _None_\n"
     pretty = [[r[0], m_dollars_int(r[1]), m_dollars_int(r[2]), pct_with_emoji(r[3]), pct_with_emoji(r[4])] for r in rows]
-    return f"*{title}*:\n```\n" + tabulate(pretty, headers=["SYM","F","S","%","%4H"], tablefmt="github") + "\n```\n"
+    return f"*{title}*:\n```\n" + render_github_table(pretty, TABLE_HEADERS) + "\n```\n"
 
 def fmt_table_single(sym: str, fut_usd: float, spot_usd: float, pct: float, pct4h: float, title: str) -> str:
     row = [[sym.upper(), m_dollars_int(fut_usd), m_dollars_int(spot_usd), pct_with_emoji(pct), pct_with_emoji(pct4h)]]
-    return f"*{title}*:\n```\n" + tabulate(row, headers=["SYM","F","S","%","%4H"], tablefmt="github") + "\n```\n"
+    return f"*{title}*:\n```\n" + render_github_table(row, TABLE_HEADERS) + "\n```\n"
 
 # ---- Telegram handlers ----
 async def start(update: Update, context: ContextTypes.DEFAULT_TYPE):
@@ -287,14 +411,17 @@ async def start(update: Update, context: ContextTypes.DEFAULT_TYPE):
         "Tip: Send a ticker (e.g., PYTH) to get a one-row table for that coin."
     )
 
-async def screen(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    global LAST_ERROR, PCT4H_CACHE
-    LAST_ERROR = None
-    PCT4H_CACHE = {}
-    try:
+# /screen results are identical for every user; cache one rendering per TTL window
+# and coalesce concurrent misses behind a lock so bursts cost one exchange hit.
+async def render_screen() -> str:
+    """Return the full /screen rendering, reusing a cached copy if it is fresh."""
+    async with STATE.screen_lock:
+        if STATE.screen_cache and time.monotonic() - STATE.screen_cache[0] < SCREEN_CACHE_TTL:
+            return STATE.screen_cache[1]
+        STATE.last_error = None
         t0 = time.time()
-        best_spot, best_fut, raw_spot_count, raw_fut_count = await asyncio.to_thread(load_best)
-        p1, p2, p3 = await asyncio.to_thread(build_priorities, best_spot, best_fut)
+        best_spot, best_fut, raw_spot_count, raw_fut_count = await load_best()
+        p1, p2, p3 = await build_priorities(best_spot, best_fut)
         dt = time.time() - t0
         text = (
             fmt_table(p1, f"Priority 1 (F≥$5M & S≥$500k — pinned excluded) — Top {TOP_N_P1}") +
@@ -302,20 +429,29 @@ async def screen(update: Update, context: ContextTypes.DEFAULT_TYPE):
             fmt_table(p3, f"Priority 3 (Pinned + S≥$3M) — Top {TOP_N_P3}") +
             f"⏱️ {dt:.1f}s • CoinEx via CCXT • tickers: spot={raw_spot_count}, fut={raw_fut_count}"
         )
+        # Don't cache renders produced while the exchange was erroring (empty tables),
+        # otherwise the failure would be served for a whole TTL window after recovery.
+        if STATE.last_error is None:
+            STATE.screen_cache = (time.monotonic(), text)
+        return text
+
+async def screen(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    try:
+        text = await render_screen()
         await update.message.reply_text(text, parse_mode=ParseMode.MARKDOWN)
     except Exception as e:
-        LAST_ERROR = f"{type(e).__name__}: {e}\n" + traceback.format_exc(limit=3)
+        STATE.last_error = f"{type(e).__name__}: {e}\n" + traceback.format_exc(limit=3)
         logging.exception("screen error")
-        await update.message.reply_text(f"Error: {LAST_ERROR}")
+        await update.message.reply_text(f"Error: {STATE.last_error}")
 
 async def excel_cmd(update: Update, context: ContextTypes.DEFAULT_TYPE):
     try:
-        best_spot, best_fut, *_ = await asyncio.to_thread(load_best)
-        p1, p2, p3 = await asyncio.to_thread(build_priorities, best_spot, best_fut)
+        best_spot, best_fut, *_ = await load_best()
+        p1, p2, p3 = await build_priorities(best_spot, best_fut)
 
-        wb = Workbook()
-        ws = wb.active
-        ws.title = "Screener"
+        # write_only streams rows straight to XML instead of keeping cell objects in memory
+        wb = Workbook(write_only=True)
+        ws = wb.create_sheet("Screener")
         # Keep legacy schema (priority,symbol,usd_24h) for compatibility
         ws.append(["priority","symbol","usd_24h"])
         for sym, fut_usd, spot_usd, _, _ in p1: ws.append(["P1", sym, fut_usd])
@@ -335,7 +471,7 @@ async def excel_cmd(update: Update, context: ContextTypes.DEFAULT_TYPE):
 
 async def diag(update: Update, context: ContextTypes.DEFAULT_TYPE):
     try:
-        best_spot, best_fut, raw_spot_count, raw_fut_count = await asyncio.to_thread(load_best)
+        best_spot, best_fut, raw_spot_count, raw_fut_count = await load_best()
         msg = (
             "*Diag*\n"
             f"- thresholds: P1 F≥${P1_FUT_MIN:,} & S≥${P1_SPOT_MIN:,} | "
@@ -343,7 +479,7 @@ async def diag(update: Update, context: ContextTypes.DEFAULT_TYPE):
             f"- rows: P1={TOP_N_P1}, P2={TOP_N_P2}, P3={TOP_N_P3}\n"
             f"- tickers fetched: spot={raw_spot_count}, fut={raw_fut_count}\n"
             f"- kept bases: spot={len(best_spot)}, fut={len(best_fut)}\n"
-            f"- last_error: {LAST_ERROR or '_None_'}"
+            f"- last_error: {STATE.last_error or '_None_'}"
         )
         await update.message.reply_text(msg, parse_mode=ParseMode.MARKDOWN)
     except Exception as e:
@@ -353,31 +489,30 @@ async def diag(update: Update, context: ContextTypes.DEFAULT_TYPE):
 def normalize_symbol_text(text: str) -> Optional[str]:
     if not text: return None
     s = text.strip()
-    candidates = re.findall(r"[A-Za-z$]{2,10}", s)
+    candidates = SYM_RE.findall(s)
     if not candidates: return None
     token = candidates[0].upper().lstrip("$")
     token = token.replace(".", "").replace(",", "")
     return token if 2 <= len(token) <= 10 else None
 
 async def coin_query(update: Update, symbol_text: str):
-    global PCT4H_CACHE
     try:
         base = normalize_symbol_text(symbol_text)
         if not base:
             await update.message.reply_text("Please provide a ticker, e.g. `PYTH`.", parse_mode=ParseMode.MARKDOWN)
             return
-        PCT4H_CACHE = {}
-        best_spot, best_fut, *_ = await asyncio.to_thread(load_best)
+        best_spot, best_fut, *_ = await load_best()
         s, f = best_spot.get(base), best_fut.get(base)
         fut_usd = usd_notional(f) if f else 0.0
         spot_usd = usd_notional(s) if s else 0.0
-        pct = pct_change(s, f)
-        pct4h = 0.0
-        if f: pct4h = await asyncio.to_thread(compute_pct4h_for_symbol, f.symbol, True)
-        elif s: pct4h = await asyncio.to_thread(compute_pct4h_for_symbol, s.symbol, False)
         if fut_usd == 0.0 and spot_usd == 0.0:
+            # Unknown/mistyped ticker — bail before spending an OHLCV round trip on it
             await update.message.reply_text(f"Couldn't find data for `{base}`.", parse_mode=ParseMode.MARKDOWN)
             return
+        pct = pct_change(s, f)
+        pct4h = 0.0
+        if f: pct4h = await compute_pct4h_for_symbol(f.symbol, True)
+        elif s: pct4h = await compute_pct4h_for_symbol(s.symbol, False)
         text = fmt_table_single(base, fut_usd, spot_usd, pct, pct4h, f"{base} (24h / 4h)")
         await update.message.reply_text(text, parse_mode=ParseMode.MARKDOWN)
     except Exception as e:
@@ -385,8 +520,9 @@ async def coin_query(update: Update, symbol_text: str):
         await update.message.reply_text(f"Error: {type(e).__name__}: {e}")
 
 async def coin_cmd(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    arg = " ".join(context.args) if context.args else ""
-    await coin_query(update, arg or "")
+    # normalize_symbol_text only ever uses the first token, so skip the join
+    arg = context.args[0] if context.args else ""
+    await coin_query(update, arg)
 
 async def text_router(update: Update, context: ContextTypes.DEFAULT_TYPE):
     await coin_query(update, update.message.text or "")
@@ -395,6 +531,11 @@ def main():
     if not TOKEN:
         raise RuntimeError("Set TELEGRAM_TOKEN env var")
     logging.basicConfig(level=logging.INFO)
+    try:
+        import uvloop  # type: ignore
+        uvloop.install()
+    except ImportError:
+        pass  # uvloop is POSIX-only; the default loop works, just slower
     app = Application.builder().token(TOKEN).build()
 
     # Commands